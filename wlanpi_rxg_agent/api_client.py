@@ -1,3 +1,4 @@
+import asyncio
 from os import PathLike
 from typing import Optional, Union
 
@@ -7,6 +8,9 @@ from requests import Response
 
 from wlanpi_rxg_agent.utils import get_eth0_mac, get_interface_ip_addr
 
+CHECK_DEVICE_PATH = "apcert/check_device"
+GET_CERT_PATH = "apcert/get_cert"
+
 
 class ApiClient:
 
@@ -16,7 +20,11 @@ class ApiClient:
         mac: Optional[str] = None,
         verify_ssl: bool = True,
         timeout: Optional[int] = 15,
+        session: Optional[requests.Session] = None,
     ):
+        # Sessions aren't guaranteed to be thread-safe, so callers that pass one
+        # in must only use it from a single thread.
+        self.session = session or requests.Session()
         self.mac = mac or get_eth0_mac()
         self.registered = False
         self.verify_ssl = verify_ssl
@@ -28,28 +36,27 @@ class ApiClient:
         if not verify_ssl:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-    def check_device(self, ip: Optional[str] = None) -> Response:
+    def _get_device_info(self, path: str, ip: Optional[str] = None) -> Response:
+        """
+        GETs an apcert endpoint that identifies this device by MAC.
+        """
         if not ip:
             ip = self.ip
-        return requests.get(
-            url=f"https://{ip}/{self.api_base}/apcert/check_device",
+        return self.session.get(
+            url=f"https://{ip}/{self.api_base}/{path}",
             params={"mac": self.mac, "device_type": "wlanpi"},
             verify=self.verify_ssl,
             timeout=self.timeout,
         )
 
+    def check_device(self, ip: Optional[str] = None) -> Response:
+        return self._get_device_info(CHECK_DEVICE_PATH, ip)
+
     def get_cert(self, ip: Optional[str] = None) -> Response:
-        if not ip:
-            ip = self.ip
-        return requests.get(
-            url=f"https://{ip}/{self.api_base}/apcert/get_cert",
-            params={"mac": self.mac, "device_type": "wlanpi"},
-            verify=self.verify_ssl,
-            timeout=self.timeout,
-        )
+        return self._get_device_info(GET_CERT_PATH, ip)
 
     def register(self, model: str, csr: str, ) -> Response:
-        return requests.post(
+        return self.session.post(
             url=f"https://{self.ip}/{self.api_base}/apcert/register",
             json={
                 "device_type": "wlanpi",
@@ -66,12 +73,17 @@ class ApiClient:
     async def upload_tcpdump(self, file_path:Union[int, str, bytes, PathLike[str], PathLike[bytes]], submit_token:str, ip: Optional[str] = None) -> Response:
         if not ip:
             ip = self.ip
-        files = {'file': open(file_path, 'rb')}
         form_data = {'token': submit_token}
-        return requests.post(
-            url=f"https://{ip}/{self.api_base}/tcpdumps/submit_tcpdump",
-            data=form_data,
-            files=files,
-            verify=self.verify_ssl,
-            timeout=self.timeout,
-        )
+
+        def post() -> Response:
+            with open(file_path, 'rb') as dump_file:
+                return self.session.post(
+                    url=f"https://{ip}/{self.api_base}/tcpdumps/submit_tcpdump",
+                    data=form_data,
+                    files={'file': dump_file},
+                    verify=self.verify_ssl,
+                    timeout=self.timeout,
+                )
+
+        # The upload can take a while; keep it off the event loop.
+        return await asyncio.to_thread(post)
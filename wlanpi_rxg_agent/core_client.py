@@ -16,6 +16,7 @@ class CoreClient:
         self.base_url = base_url
         self.api_url = f"{base_url}/api/v1"
         self.openapi_def_path = f"{self.api_url}/openapi.json"
+        self.session = requests.Session()
 
         self.base_headers = {
             "accept": "application/json",
@@ -28,7 +29,7 @@ class CoreClient:
 
         while True:
             try:
-                return requests.get(
+                return self.session.get(
                     url=self.openapi_def_path, headers=self.base_headers
                 ).json()
             except JSONDecodeError:
@@ -48,7 +49,7 @@ class CoreClient:
         self.logger.debug(
             f"Executing {method.upper()} on path {path} with data: {str(data)}"
         )
-        response = requests.request(
+        response = self.session.request(
             method=method,
             params=params,
             url=f"{self.base_url}/{path}",
@@ -1,24 +1,19 @@
 import logging
 import pprint
 import random
-import re
 import string
 
 import os
 import subprocess
 import time
 from typing import Optional, Any
-import dpkt
 import kismet_rest  # type: ignore
-import time
 
-from scapy.data import DLT_IEEE802_11, DLT_EN10MB
-from scapy.layers.dot11 import Dot11
-from scapy.utils import PcapReader, PcapWriter, PcapNgReader, PcapNgWriter
 import kismet_capture
-from models.runcommand_error import RunCommandError
 from utils import run_command
 
+PASSWORD_CHARS = string.ascii_letters + string.digits + string.punctuation
+
 
 class KismetControlException(Exception):
     pass
@@ -57,8 +52,8 @@ class KismetControl:
         out_dict = {}
         with open(self.__kismet_httpd_conf_file, "r") as f:
             for line in f:
-                if "=" in line:
-                    key, val = line.split("=", 1)
+                key, sep, val = line.partition("=")
+                if sep:
                     out_dict[key] = val.strip()
         return out_dict
 
@@ -71,8 +66,7 @@ class KismetControl:
         # Ensure directory exists before writing the file
         os.makedirs(os.path.dirname(self.__kismet_httpd_conf_file), exist_ok=True)
         with open(self.__kismet_httpd_conf_file, "w") as f:
-            for key, value in contents.items():
-                f.write(f"{key}={value}\n")
+            f.write("".join(f"{key}={value}\n" for key, value in contents.items()))
         return contents
 
     def load_kismet_config(self) -> dict[str, str]:
@@ -95,11 +89,8 @@ class KismetControl:
         if length < 4:  # Ensure the password has a decent length
             raise ValueError("Password length should be at least 4 characters.")
 
-        # Define potential password characters
-        all_chars = string.ascii_letters + string.digits + string.punctuation
-
         # Generate a random password
-        password = ''.join(random.choice(all_chars) for _ in range(length))
+        password = ''.join(random.choice(PASSWORD_CHARS) for _ in range(length))
 
         return password
 
@@ -148,11 +139,18 @@ class KismetControl:
     def source_uuid_to_name(self, source_uuid, sources: Optional[list[Any]] = None) -> Optional[str]:
         if sources is None:
             sources = list(self.all_kismet_sources().values())
-        for x in sources:
-            if x['kismet.datasource.uuid'] == source_uuid and x[
-                'kismet.datasource.uuid'] != '00000000-0000-0000-0000-000000000000':
-                return x['kismet.datasource.interface']
-        return None
+        return self.source_uuid_name_map(sources).get(source_uuid)
+
+    @staticmethod
+    def source_uuid_name_map(sources: list[Any]) -> dict[str, str]:
+        """
+        Builds a uuid -> interface name lookup for a list of sources. If
+        several sources share a uuid, the first one in the list wins, and
+        sources with the null uuid (not in use) are left out.
+        """
+        return {x['kismet.datasource.uuid']: x['kismet.datasource.interface']
+                for x in reversed(sources)
+                if x['kismet.datasource.uuid'] != '00000000-0000-0000-0000-000000000000'}
 
     def get_kismet_interface_uuid(self, interface: str) -> Optional[str]:
         for x in self.kismet_sources.interfaces():
@@ -194,14 +192,18 @@ class KismetControl:
 
     def set_sources_by_name(self, source_names: list[str]) -> list[tuple[str, str, bool]]:
         results = []
-        # Remove other sources that aren't in the list
-        for source_name, source_uuid in self.active_kismet_interfaces().items():
+        # Query kismet once; closing unwanted sources can't change whether a
+        # wanted one is active.
+        active_names = self.active_kismet_interfaces().keys()
+        wanted_names = set(source_names)
 
-            if source_uuid not in source_names:
-                results.append(('remove', source_name, self.close_source_by_name(source_name)))
+        # Remove other sources that aren't in the list, in the order kismet
+        # reported them.
+        for source_name in [name for name in active_names if name not in wanted_names]:
+            results.append(('remove', source_name, self.close_source_by_name(source_name)))
 
         for source_name in source_names:
-            if source_name not in self.active_kismet_interfaces():
+            if source_name not in active_names:
                 results.append(('add', source_name, self.add_source(source_name)))
         return results
 
@@ -224,7 +226,7 @@ class KismetControl:
             'kismet.device.base.type'
             # 'dot11.device'
         ]
-        current_sources = list(self.all_kismet_sources().values())
+        source_names = self.source_uuid_name_map(list(self.all_kismet_sources().values()))
         results = []
         for ap in self.kismet_devices.dot11_access_points(fields=fields_of_interest):
 
@@ -232,7 +234,7 @@ class KismetControl:
             for seer in ap['kismet.device.base.seenby']:
                 # seen_by.append(self.source_uuid_to_name(seer, interfaces=current_avail_interfaces))
                 new_seer = {key.lstrip("kismet.common.seenby."): value for key, value in seer.items()}
-                new_seer['interface'] = self.source_uuid_to_name(new_seer['uuid'], sources=current_sources)
+                new_seer['interface'] = source_names.get(new_seer['uuid'])
                 seen_by.append(new_seer)
             if 'kismet.device.base.signal' in ap:
                 signal = {key.lstrip("kismet.common.signal."): value for key, value in
@@ -279,7 +281,7 @@ class KismetControl:
         ]
 
         res = KismetControl.empty_seen_devices()
-        current_sources = list(self.all_kismet_sources().values())
+        source_names = self.source_uuid_name_map(list(self.all_kismet_sources().values()))
 
         # Clients,Bridges, and Devices have client maps
         for device in self.kismet_devices.all():
@@ -290,10 +292,10 @@ class KismetControl:
             for seer in device['kismet.device.base.seenby']:
                 # seen_by.append(self.source_uuid_to_name(seer, interfaces=current_avail_interfaces))
                 new_seer = {key.lstrip("kismet.common.seenby."): value for key, value in seer.items()}
-                new_seer['interface'] = self.source_uuid_to_name(new_seer['uuid'], sources=current_sources)
+                new_seer['interface'] = source_names.get(new_seer['uuid'])
                 seen_by.append(new_seer)
             if 'kismet.device.base.signal' in device:
-                signal = {re.sub(r"^kismet\.common\.signal\.", "", key): value for key, value in
+                signal = {key.removeprefix("kismet.common.signal."): value for key, value in
                           device['kismet.device.base.signal'].items()}
             else:
                 signal = None
@@ -10,6 +10,7 @@ class AgentConfigFile(ConfigFile):
             "General": {
                 "override_rxg": "",
                 "fallback_rxg": "",
+                "last_rxg": "",
             }
         })
 
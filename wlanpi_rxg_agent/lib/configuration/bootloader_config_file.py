@@ -1,6 +1,5 @@
 import copy
-import json
-from json import JSONDecodeError
+import functools
 
 from lib.configuration.config_file import ConfigFile
 from utils import run_command
@@ -21,40 +20,34 @@ class BootloaderConfigFile(ConfigFile):
         })
 
 
-    def load(self):
-        if self.count_partitions() < 3:
+    def _on_data_partition(self, func):
+        """
+        Runs func with the bootloader data partition mounted at /mnt, or
+        simulates the config on devices without that partition.
+        """
+        if self.partition_count < 3:
             self.logger.warning("Insufficient partitions--simulating instead.")
             self.data = self.simulate_config()
-        else:
-            run_command(f"mount {self.data_part_path} /mnt", shell=True, use_shlex=False)
-            try:
-                super().load()
-            finally:
-                run_command(f"umount {self.data_part_path}", shell=True, use_shlex=False)
+            return
+        run_command(f"mount {self.data_part_path} /mnt", shell=True, use_shlex=False)
+        try:
+            func()
+        finally:
+            run_command(f"umount {self.data_part_path}", shell=True, use_shlex=False)
 
+    def load(self):
+        self._on_data_partition(super().load)
 
     def save(self):
-        if self.count_partitions() < 3:
-            self.logger.warning("Insufficient partitions--simulating instead.")
-            self.data = self.simulate_config()
-        else:
-            run_command(f"mount {self.data_part_path} /mnt", shell=True, use_shlex=False)
-            try:
-                super().save()
-            finally:
-                run_command(f"umount {self.data_part_path}", shell=True, use_shlex=False)
+        self._on_data_partition(super().save)
 
-    def load_or_create_defaults(self):
-        if self.count_partitions() < 3:
-            self.logger.warning("Insufficient partitions--simulating instead.")
-            self.data = self.simulate_config()
-        else:
-            run_command(f"mount {self.data_part_path} /mnt", shell=True, use_shlex=False)
-            try:
-                super().load_or_create_defaults()
-            finally:
-                run_command(f"umount {self.data_part_path}", shell=True, use_shlex=False)
+    # load_or_create_defaults is inherited: it goes through load() above, so
+    # it must not mount the partition itself as well.
 
+    @functools.cached_property
+    def partition_count(self) -> int:
+        # The partition layout doesn't change at runtime, so only shell out once.
+        return self.count_partitions()
 
     def simulate_config(self) -> object:
         return copy.deepcopy(self.defaults)
@@ -12,11 +12,12 @@ from core_client import CoreClient
 from lib.wifi_control.wifi_control import WifiControl
 from wpa_supplicant.core import WpaSupplicantDriver, WpaSupplicant, Interface
 import threading
-import time
 
 from models.runcommand_error import RunCommandError
 from utils import run_command_async
 
+LEASE_BODY_PATTERN = re.compile(r"lease\s+\{(?P<body>.*?)\}", re.MULTILINE | re.DOTALL)
+
 
 class WifiInterfaceException(Exception):
     pass
@@ -90,7 +91,7 @@ class WifiInterface():
         try:
             # Release the current DHCP lease
             await run_command_async(["dhclient", "-r", self.name], raise_on_fail=True)
-            time.sleep(3)
+            await asyncio.sleep(3)
             # Obtain a new DHCP lease
             await run_command_async(["dhclient", self.name], raise_on_fail=True)
         except RunCommandError as err:
@@ -115,11 +116,11 @@ class WifiInterface():
 
     @staticmethod
     def parse_lease_file(file_path: str) -> list[dict[str, Any]]:
-        body_pattern=re.compile(r"lease\s+\{(?P<body>.*?)\}", re.MULTILINE | re.DOTALL)
         leases = []
         with open(file_path) as f:
-            for match in body_pattern.finditer(f.read()):
-                lease: dict[str,dict[str,str]] = {"option":{}}
+            for match in LEASE_BODY_PATTERN.finditer(f.read()):
+                options: dict[str,str] = {}
+                lease: dict[str,dict[str,str]] = {"option":options}
                 for line in match.group("body").split("\n"):
                     data = line.strip().rstrip(";").split(' ', 1)
                     if len(data) > 0:
@@ -127,7 +128,7 @@ class WifiInterface():
                             continue
                         if data[0] == "option":
                             opt_key, opt_val = data[1].split(' ', 1)
-                            lease["option"][opt_key] = opt_val
+                            options[opt_key] = opt_val
                         else:
                             if len(data) > 1:
                                 lease[data[0]] = data[1]
@@ -156,16 +157,16 @@ class WifiInterface():
         self.logger.info(f"Checking lease files for routes for {interface}")
         if router_addresses is None:
             my_lease = None
-            base_leases = self.parse_lease_file(f"/var/lib/dhcp/dhclient.leases")
-            self.logger.debug("Base leases: " + str(base_leases))
+            base_leases = await asyncio.to_thread(self.parse_lease_file, "/var/lib/dhcp/dhclient.leases")
+            self.logger.debug("Base leases: %s", base_leases)
             for lease in sorted([x for x in base_leases if "interface" in x and x["interface"].strip('"') == interface ], key=lambda d: d['expire'].split(' ', 1)[1]):
                 if "interface" in lease and lease["interface"].strip('"') == interface:
                     my_lease = lease
                     break
 
             if not my_lease:
-                subfile_leases = self.parse_lease_file(f"/var/lib/dhcp/dhclient.{interface}.leases")
-                self.logger.debug("Subfile leases: " + str(subfile_leases))
+                subfile_leases = await asyncio.to_thread(self.parse_lease_file, f"/var/lib/dhcp/dhclient.{interface}.leases")
+                self.logger.debug("Subfile leases: %s", subfile_leases)
                 for lease in sorted([x for x in subfile_leases if "interface" in x and x["interface"].strip('"') == interface ], key=lambda d: d['expire'].split(' ', 1)[1]):
                     if "interface" in lease and lease["interface"].strip('"') == interface:
                         my_lease = lease
@@ -206,7 +207,7 @@ class WifiInterface():
     def blocking_scan(self):
         scan_results = self.interface.scan(block=True)
         for bss in scan_results:
-            print(bss.get_ssid())
+            self.logger.info("%s: found %s", self.name, bss.get_ssid())
 
 
     def remove_all_networks(self):
@@ -220,20 +221,36 @@ class WifiInterface():
         add_network_future = self.event_loop.create_future()
         signal = None
         states = []
+
+        def resolve(result=None, error: Optional[Exception] = None):
+            # Later state changes (e.g. a disconnect after completing) can still
+            # arrive once the outcome is decided. done() also covers cancelled.
+            if add_network_future.done():
+                return
+            if error is not None:
+                add_network_future.set_exception(error)
+            else:
+                add_network_future.set_result(result)
+
         def prop_change_callback(result):
-            self.logger.debug(f"{self.name}: {result}")
+            # Signals are delivered on the reactor thread, so outcomes have to be
+            # handed to the event loop that owns the future.
+            self.logger.debug("%s: %s", self.name, result)
+            if add_network_future.done():
+                return
             if "State" in result:
                 states.append(result)
                 if result["State"] == "completed":
                     self.logger.debug(f"Connection to {ssid} completed")
-                    add_network_future.set_result(states)
+                    self.event_loop.call_soon_threadsafe(resolve, list(states))
+                    return
             if "DisconnectReason" in result:
                 if result["DisconnectReason"] == 15:
                     self.logger.debug(f"Disconnecting: {result['DisconnectReason']}")
-                    add_network_future.set_exception(WifiInterfaceAuthenticationError(f"An authentication error occurred: {states}"))
-                if result["DisconnectReason"] == 13:
+                    self.event_loop.call_soon_threadsafe(resolve, None, WifiInterfaceAuthenticationError(f"An authentication error occurred: {states}"))
+                elif result["DisconnectReason"] == 13:
                     self.logger.debug(f"Disconnecting: {result['DisconnectReason']}")
-                    add_network_future.set_exception(WifiInterfaceDisconnectedError(f"A disconnection occurred: {states}"))
+                    self.event_loop.call_soon_threadsafe(resolve, None, WifiInterfaceDisconnectedError(f"A disconnection occurred: {states}"))
 
         self.remove_all_networks()
 
@@ -265,6 +282,9 @@ class WifiInterface():
             raise TimeoutError(f"Timeout connecting {self.name} to {ssid}")
         finally:
             signal.cancel()
+            # The wait is shielded, so a timeout leaves this future pending;
+            # cancel it so a late callback can't leave an unretrieved exception.
+            add_network_future.cancel()
 
     def disconnect(self):
         self.logger.info(f"Disconnecting {self.name}")
@@ -285,11 +305,15 @@ class WiFiControlWpaSupplicant(WifiControl):
         self.logger.debug("Setting up reactor")
         self.reactor = AsyncioSelectorReactor(eventloop=asyncio.new_event_loop())
         # self.reactor.install()
+        # Wait for the reactor to actually be running rather than sleeping a
+        # fixed amount; the callback must be queued before the thread starts.
+        reactor_running = threading.Event()
+        self.reactor.callWhenRunning(reactor_running.set)
         self.reactor_thread = threading.Thread(target=self.reactor.run, kwargs={'installSignalHandlers': 0})
         self.reactor_thread.start()
         self.reactor._justStopped = False
-        # Let the reactor start
-        time.sleep(0.1)
+        if not reactor_running.wait(timeout=5):
+            self.logger.warning("Reactor did not report running within 5 seconds")
         self.current_adapter_config = {}
 
         # Start Driver
@@ -300,21 +324,34 @@ class WiFiControlWpaSupplicant(WifiControl):
 
         self.interfaces = {}
 
+    async def aclose(self):
+        """
+        Stops the reactor thread without blocking the event loop while it
+        winds down.
+        """
+        if self.reactor_thread.is_alive():
+            self.reactor.callFromThread(self.reactor.stop)
+            await asyncio.to_thread(self.reactor_thread.join, 4)
+
     def __del__(self):
-        self.reactor.stop()
-        self.reactor_thread.join(timeout=4)
+        # Fallback for instances that were never closed. Only signal the
+        # reactor here; joining from a finalizer could stall whatever thread
+        # the garbage collector happens to run on.
+        reactor_thread = getattr(self, "reactor_thread", None)
+        if reactor_thread is not None and reactor_thread.is_alive():
+            self.reactor.callFromThread(self.reactor.stop)
 
     def get_or_create_interface(self, interface_name):
-
-
-        if interface_name not in self.interfaces:
+        wifi_interface = self.interfaces.get(interface_name)
+        if wifi_interface is None:
             try:
-                self.interfaces[interface_name] = WifiInterface(interface_name, self.supplicant, self.supplicant.create_interface(interface_name), event_loop=self.event_loop)
+                wifi_interface = WifiInterface(interface_name, self.supplicant, self.supplicant.create_interface(interface_name), event_loop=self.event_loop)
             except wpa_supplicant.core.InterfaceExists as e:
                 self.logger.info(f"Interface {interface_name} already exists; adding to list.")
-                self.interfaces[interface_name] = WifiInterface(interface_name, self.supplicant, self.supplicant.get_interface(interface_name), event_loop=self.event_loop)
+                wifi_interface = WifiInterface(interface_name, self.supplicant, self.supplicant.get_interface(interface_name), event_loop=self.event_loop)
+            self.interfaces[interface_name] = wifi_interface
 
-        return self.interfaces[interface_name]
+        return wifi_interface
 
 
 if __name__ == "__main__":
@@ -348,5 +385,5 @@ if __name__ == "__main__":
         await wlan_if.add_default_routes()
         print("Done")
 
-        del wc
-    asyncio.get_event_loop().run_until_complete(main())
\ No newline at end of file
+        await wc.aclose()
+    asyncio.run(main())
\ No newline at end of file
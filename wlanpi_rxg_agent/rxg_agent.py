@@ -3,20 +3,15 @@ import json
 import logging
 import os
 import ssl
-import subprocess
-import time
 from asyncio import Task
-from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Any
 
-import toml
-from requests import ConnectionError, ConnectTimeout, ReadTimeout
+from requests import ConnectionError, ConnectTimeout, ReadTimeout, Session
 
 import wlanpi_rxg_agent.utils as utils
-from lib.configuration.agent_config_file import AgentConfigFile
+from lib.configuration.agent_config_file import AGENT_CONFIG_DIR, AgentConfigFile
 from rxg_mqtt_client import RxgMqttClient
-from kismet_control import KismetControl
 from lib.configuration.bridge_config_file import BridgeConfigFile
 from structures import TLSConfig
 from wlanpi_rxg_agent.api_client import ApiClient
@@ -31,10 +26,8 @@ logging.getLogger("requests").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 logging.getLogger("wlanpi_rxg_agent.rxg_agent").setLevel(logging.INFO)
 
-CONFIG_DIR = "/etc/wlanpi-rxg-agent"
+CONFIG_DIR = AGENT_CONFIG_DIR
 CONFIG_FILE = os.path.join(CONFIG_DIR, "config.toml")
-BRIDGE_CONFIG_DIR = "/etc/wlanpi-mqtt-bridge"
-BRIDGE_CONFIG_FILE = os.path.join(BRIDGE_CONFIG_DIR, "config.toml")
 
 
 class RXGAgent:
@@ -61,6 +54,7 @@ class RXGAgent:
 
         self.override_server: Optional[str] = None
         self.fallback_server: Optional[str] = None
+        self.last_known_server: Optional[str] = None
         self.active_server: Optional[str] = None
         self.new_server: Optional[str] = None
 
@@ -71,6 +65,7 @@ class RXGAgent:
 
         self.registered = False
         self.certification_complete = False
+        self.last_registration_status: Optional[str] = None
 
         self.api_verify_ssl = False
 
@@ -89,6 +84,11 @@ class RXGAgent:
         self.current_cert = ""
 
         self.executor  = ThreadPoolExecutor(1)
+        # Shared by the ApiClients created for each check, keeping connections
+        # to the controller alive. Only use it from self.executor's thread.
+        self.api_session = Session()
+        # Probes traceroute hops concurrently during initial discovery.
+        self.discovery_pool = ThreadPoolExecutor(3, thread_name_prefix="rxg-discovery")
         self.background_tasks: set[Task] = set()
 
     def reinitialize_cert_tool(self, partner_id: Optional[str] = None):
@@ -106,20 +106,22 @@ class RXGAgent:
         self.agent_config_file.load_or_create_defaults(allow_empty=False)
         self.override_server = self.agent_config_file.data.get('General').get("override_rxg", None)
         self.fallback_server = self.agent_config_file.data.get('General').get("fallback_rxg", None)
+        self.last_known_server = self.agent_config_file.data.get('General').get("last_rxg", None) or None
 
-    def test_address_for_rxg(self, ip: str) -> bool:
+    def test_address_for_rxg(self, ip: str, session: Optional[Session] = None) -> bool:
         """
         Checks that the expected WLAN Pi control node on an rXg is present and
         responsive on an IP address, which would indicate that it's a viable
-        controller.
+        controller. Pass a session when calling from any thread other than
+        the agent's executor.
         """
-        api_client = ApiClient(verify_ssl=self.api_verify_ssl, timeout=5)
+        api_client = ApiClient(verify_ssl=self.api_verify_ssl, timeout=5, session=session or self.api_session)
 
         try:
             resp = api_client.check_device(ip)
 
         except (ConnectTimeout, ConnectionError, ReadTimeout) as e:
-            self.logger.warning(f"Testing of address {ip} failed: {e}")
+            self.logger.warning("Testing of address %s failed: %s", ip, e)
             return False
 
         if resp.status_code == 200:
@@ -132,6 +134,13 @@ class RXGAgent:
                     return True
         return False
 
+    def probe_address_for_rxg(self, ip: str) -> bool:
+        """
+        test_address_for_rxg for use from worker threads, with its own session.
+        """
+        with Session() as session:
+            return self.test_address_for_rxg(ip, session)
+
     # /etc/wlanpi-rxg-agent/
 
     def find_rxg(self, max_hops=3):
@@ -139,6 +148,15 @@ class RXGAgent:
         if self.override_server and self.test_address_for_rxg(self.override_server):
             return self.override_server
 
+        # On startup, try the last server we successfully registered with
+        # before falling back to a full scan.
+        if (
+            not self.active_server
+            and self.last_known_server
+            and self.test_address_for_rxg(self.last_known_server)
+        ):
+            return self.last_known_server
+
         first_gateway = utils.get_default_gateways().get("eth0", None)
 
         if not first_gateway:
@@ -158,9 +176,28 @@ class RXGAgent:
             for x in sorted(filtered_hops, key=lambda hop: hop["hop"])
         ]
 
-        for i, address in enumerate(hop_addresses):
-            if i < max_hops and self.test_address_for_rxg(address):
-                return address
+        candidates = hop_addresses[:max_hops]
+        if self.active_server:
+            # This also runs every periodic cycle. Scan nearest-first and stop
+            # at the first hit so hops beyond the rXg are never contacted.
+            for address in candidates:
+                if self.test_address_for_rxg(address):
+                    return address
+        elif candidates:
+            # No server yet: each probe can take up to the client timeout, so
+            # test the hops concurrently, but still prefer the nearest one
+            # that responds.
+            probes = [
+                self.discovery_pool.submit(self.probe_address_for_rxg, address)
+                for address in candidates
+            ]
+            try:
+                for address, probe in zip(candidates, probes):
+                    if probe.result():
+                        return address
+            finally:
+                for probe in probes:
+                    probe.cancel()
 
         # Todo: insert fallback here
         if self.fallback_server and self.test_address_for_rxg(self.fallback_server):
@@ -171,12 +208,15 @@ class RXGAgent:
     def get_client_cert(self, server_ip: Optional[str] = None):
         if not server_ip:
             server_ip = self.active_server
-        api_client = ApiClient(verify_ssl=self.api_verify_ssl, server_ip=server_ip)
+        api_client = ApiClient(verify_ssl=self.api_verify_ssl, server_ip=server_ip, session=self.api_session)
         get_cert_resp = api_client.get_cert()
         if get_cert_resp.status_code == 200:
             # Registration has succeeded, we need to get our certs.
             response_data = get_cert_resp.json()
-            self.logger.debug(f"Get Cert Response: {json.dumps(response_data)}")
+            # The logger for this module is capped at INFO, so only serialize
+            # the response when debug logging is actually on.
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Get Cert Response: %s", json.dumps(response_data))
 
             return (
                 True,
@@ -199,33 +239,47 @@ class RXGAgent:
             server_ip=server_ip
         )
         if get_cert_success:
-            if not status == "approved":
-                self.logger.warning(
-                    "Server has not approved registration yet. Waiting for next cycle."
-                )
-                return False
-            if not cert_str:
-                self.logger.warning(
-                    "Server has not provided a certificate. Waiting for next cycle"
-                )
-                return False
-
-            self.current_cert = cert_str
-            self.cert_tool.save_cert(cert_str)
-            self.current_ca = ca_str
-            self.cert_tool.save_ca(ca_str)
-            if host is not None:
-                self.active_server = host
-            self.active_port = port
-            return True
+            return self.apply_client_cert(status, ca_str, cert_str, host, port)
         return False
 
+    def apply_client_cert(
+        self,
+        status: Optional[str],
+        ca_str: Optional[str],
+        cert_str: Optional[str],
+        host: Optional[str],
+        port: Optional[int],
+    ) -> bool:
+        """
+        Saves an already-retrieved certificate response and adopts the server
+        and port it specifies.
+        """
+        if not status == "approved":
+            self.logger.warning(
+                "Server has not approved registration yet. Waiting for next cycle."
+            )
+            return False
+        if not cert_str:
+            self.logger.warning(
+                "Server has not provided a certificate. Waiting for next cycle"
+            )
+            return False
+
+        self.current_cert = cert_str
+        self.cert_tool.save_cert(cert_str)
+        self.current_ca = ca_str
+        self.cert_tool.save_ca(ca_str)
+        if host is not None:
+            self.active_server = host
+        self.active_port = port
+        return True
+
     def handle_registration(self, server_ip: Optional[str] = None) -> bool:
         if not server_ip:
             server_ip = self.active_server
-        api_client = ApiClient(server_ip=server_ip, verify_ssl=self.api_verify_ssl)
+        api_client = ApiClient(server_ip=server_ip, verify_ssl=self.api_verify_ssl, session=self.api_session)
         try:
-            self.logger.debug(f"Checking if we need to register with {api_client.ip}")
+            self.logger.debug("Checking if we need to register with %s", api_client.ip)
             resp = api_client.check_device()
             if resp.status_code == 200:
                 response_data = resp.json()
@@ -261,7 +315,7 @@ class RXGAgent:
             # Attempt to get our cert and CA
             if self.registered:
                 self.logger.debug(
-                    f"Registered with {api_client.ip}. Attempting to get cert info."
+                    "Registered with %s. Attempting to get cert info.", api_client.ip
                 )
                 return self.renew_client_cert()
 
@@ -280,12 +334,7 @@ class RXGAgent:
             await self.rxg_mqtt_client.stop()
             del self.rxg_mqtt_client
 
-        eth0_res = subprocess.run(
-            "jc ifconfig eth0", capture_output=True, text=True, shell=True
-        )
-
-        eth0_data = json.loads(eth0_res.stdout)[0]
-        eth0_mac = eth0_data["mac_addr"]
+        eth0_mac = utils.get_eth0_mac()
 
         tls_config = TLSConfig(ca_certs=ca_file, certfile=cert_file, keyfile=key_file, cert_reqs=ssl.VerifyMode(cert_reqs), tls_version=ssl.PROTOCOL_TLSv1_2, ciphers=None) if use_tls else None
         self.logger.info(
@@ -297,12 +346,24 @@ class RXGAgent:
         self.mqtt_task = self.async_loop.create_task(self.rxg_mqtt_client.go())
         self.background_tasks.add(self.mqtt_task)
         self.mqtt_task.add_done_callback(self.background_tasks.remove)
+        self.mqtt_task.add_done_callback(self.log_mqtt_task_exit)
+
+    def log_mqtt_task_exit(self, task: Task):
+        # Tasks replaced by reconfigure_mqtt_client are stopped on purpose.
+        if task is not self.mqtt_task or task.cancelled():
+            return
+        exception = task.exception()
+        # A clean return after stop() is an intentional shutdown, not a crash.
+        mqtt_client = getattr(self, "rxg_mqtt_client", None)
+        if exception is None and (mqtt_client is None or not mqtt_client.run):
+            return
+        self.logger.warning("Mqtt task may have died:", exc_info=exception)
 
     async def configure_mqtt_bridge(self):
         self.logger.info("Reconfiguring Bridge")
         # Try to load existing toml and preserve. If we fail, it doesn't matter that much.
         async with self.bridge_config_lock:
-            self.bridge_config_file.load_or_create_defaults()
+            await self.run_in_executor(self.bridge_config_file.load_or_create_defaults)
 
             # Rewrite Bridge's config.toml
             self.bridge_config_file.data["MQTT"]["server"] = self.active_server
@@ -311,13 +372,13 @@ class RXGAgent:
             self.bridge_config_file.data["MQTT_TLS"]["ca_certs"] = self.cert_tool.ca_file
             self.bridge_config_file.data["MQTT_TLS"]["certfile"] = self.cert_tool.cert_file
             self.bridge_config_file.data["MQTT_TLS"]["keyfile"] = self.cert_tool.key_file
-            self.bridge_config_file.save()
+            await self.run_in_executor(self.bridge_config_file.save)
 
             # Configure the internal client as well, as we transition to using it.
             await self.reconfigure_mqtt_client(self.active_server, self.active_port, True, self.cert_tool.ca_file, self.cert_tool.cert_file, self.cert_tool.key_file, 2)
 
             self.logger.info("Bridge config written. Restarting service.")
-            self.bridge_control.restart()
+            await self.run_in_executor(self.bridge_control.restart)
 
     async def check_for_new_server(self) -> bool:
         # if not self.active_server:
@@ -327,7 +388,7 @@ class RXGAgent:
         #     self.logger.info("Server reconfig in process, skipping new server check")
 
         try:
-            new_server = self.find_rxg()
+            new_server = await self.run_in_executor(self.find_rxg)
         except RXGAgentException:
             self.logger.warning(
                 "Check for new server failed--no valid possibilities were found"
@@ -341,7 +402,7 @@ class RXGAgent:
                 f"New or higher-precedence server found, dropping {self.active_server}"
                 f" and reconfiguring for {new_server} "
             )
-            self.bridge_control.stop()
+            await self.run_in_executor(self.bridge_control.stop)
             self.new_server = new_server
             do_reconfigure = True
 
@@ -354,7 +415,7 @@ class RXGAgent:
         if do_reconfigure:
             if self.new_server:
                 self.active_server = self.new_server
-            if self.handle_registration():
+            if await self.run_in_executor(self.handle_registration):
                 self.new_server = None
             else:
                 self.logger.warning(
@@ -363,14 +424,29 @@ class RXGAgent:
                 return False
 
             self.logger.info("Registration complete. Reconfiguring bridge.")
+            await self.save_last_known_server()
             await self.configure_mqtt_bridge()
         return do_reconfigure
 
+    async def save_last_known_server(self):
+        """
+        Persists the active server so the next startup can skip the rXg scan
+        if it's still reachable.
+        """
+        if not self.active_server or self.active_server == self.last_known_server:
+            return
+        async with self.agent_config_lock:
+            self.agent_config_file.data.setdefault("General", {})[
+                "last_rxg"
+            ] = self.active_server
+            await self.run_in_executor(self.agent_config_file.save)
+        self.last_known_server = self.active_server
+
     async def check_for_new_certs(self, server_ip: Optional[str] = None):
         if not server_ip:
             server_ip = self.active_server
-        get_cert_success, status, ca_str, cert_str, host, port = self.get_client_cert(
-            server_ip=server_ip
+        get_cert_success, status, ca_str, cert_str, host, port = (
+            await self.run_in_executor(self.get_client_cert, server_ip)
         )
 
         if get_cert_success:
@@ -395,7 +471,7 @@ class RXGAgent:
                 # self.active_port = port
 
             if need_to_reload:
-                self.renew_client_cert()
+                self.apply_client_cert(status, ca_str, cert_str, host, port)
                 await self.configure_mqtt_bridge()
 
         else:
@@ -406,8 +482,8 @@ class RXGAgent:
     ) -> tuple[bool, str]:
         if not server_ip:
             server_ip = self.active_server
-        api_client = ApiClient(server_ip=server_ip, verify_ssl=self.api_verify_ssl)
-        self.logger.info(f"Checking registration status {api_client.ip}")
+        api_client = ApiClient(server_ip=server_ip, verify_ssl=self.api_verify_ssl, session=self.api_session)
+        self.logger.info("Checking registration status %s", api_client.ip)
         resp = api_client.check_device()
         if resp.status_code == 200:
             response_data = resp.json()
@@ -417,25 +493,39 @@ class RXGAgent:
             )
         return False, "unknown"
 
+    async def run_in_executor(self, func, *args):
+        """
+        Runs a blocking call (typically an ApiClient request) on the agent's
+        executor so it doesn't stall the event loop.
+        """
+        return await self.async_loop.run_in_executor(self.executor, func, *args)
+
     async def do_periodic_checks(self):
         try:
             self.logger.debug("Running periodic checks")
             registration_status = False
             if self.active_server:
-                registration_status, reg_status_response = self.check_registration_status()
+                registration_status, reg_status_response = await self.run_in_executor(
+                    self.check_registration_status
+                )
                 self.registered = registration_status
+                status_changed = reg_status_response != self.last_registration_status
+                self.last_registration_status = reg_status_response
                 if not registration_status:
-                    self.handle_registration()
+                    await self.run_in_executor(self.handle_registration)
                 elif not reg_status_response.lower() == "approved":
-                    self.logger.warning(
-                        "Device has not been approved, decertifying and stopping bridge if it's running."
-                    )
+                    # Only stop the bridge when we transition into this state,
+                    # rather than on every cycle while awaiting approval.
+                    if status_changed:
+                        self.logger.warning(
+                            "Device has not been approved, decertifying and stopping bridge if it's running."
+                        )
+                        await self.run_in_executor(self.bridge_control.stop)
                     self.certification_complete = False
                     self.registered = False
-                    self.bridge_control.stop()
                 else:
                     if not self.certification_complete or not self.registered:
-                        self.handle_registration()
+                        await self.run_in_executor(self.handle_registration)
 
                 # Check MQTT
                 if self.registered and (not self.rxg_mqtt_client or self.rxg_mqtt_client.run == False or (self.mqtt_task is not None and self.mqtt_task.done())):
@@ -447,7 +537,7 @@ class RXGAgent:
             if not await self.check_for_new_server() and registration_status:
                 await self.check_for_new_certs()
         except Exception as e:
-            self.logger.error(f"Something went wrong during periodic checks: {e}", exc_info=e)
+            self.logger.error("Something went wrong during periodic checks: %s", e, exc_info=e)
 
 
     async def handle_remote_agent_reconfiguration(self, new_config:dict[str, Any]):
@@ -461,8 +551,9 @@ class RXGAgent:
             self.agent_config_file.data["General"] = {
                 "override_rxg": self.override_server,
                 "fallback_rxg": self.fallback_server,
+                "last_rxg": self.last_known_server,
             }
-            self.agent_config_file.save()
+            await self.run_in_executor(self.agent_config_file.save)
 
 
     @staticmethod
@@ -484,13 +575,9 @@ class RXGAgent:
         self.background_tasks.add(periodic_task)
         periodic_task.add_done_callback(self.background_tasks.remove)
         # self.async_loop.run_forever()
-        while True:
-            if self.mqtt_task is not None and self.mqtt_task.done():
-                self.logger.warning("Mqtt task may have died:", exc_info=self.mqtt_task.exception())
-
-
-
-            await asyncio.sleep(0.5)
+        # MQTT task exits are reported by its done callback, so there's
+        # nothing to poll here; just run until the periodic checks stop.
+        await periodic_task
 
 
 
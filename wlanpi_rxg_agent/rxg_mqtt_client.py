@@ -1,6 +1,4 @@
-import re
 from os import unlink
-from ssl import SSLCertVerificationError
 from typing import Optional, Callable, Union, Any, Coroutine
 
 import json
@@ -9,8 +7,6 @@ import logging
 import random
 import string
 
-import socket
-import time
 import paho.mqtt.client as mqtt
 import schedule
 import asyncio
@@ -27,6 +23,8 @@ from structures import TLSConfig, MQTTResponse
 import utils
 from utils import run_command_async
 
+CAPTURE_NAME_CHARS = string.ascii_letters + string.digits
+
 
 class RxgMqttClient:
     __global_base_topic = "wlan-pi/all/agent"
@@ -59,6 +57,11 @@ class RxgMqttClient:
         self.wifi_control = WiFiControlWpaSupplicant()
 
         self.my_base_topic = f"wlan-pi/{identifier}/agent"
+        # Precomputed prefixes so incoming topics can be filtered with plain
+        # string checks instead of wildcard matching.
+        self.global_topic_prefix = f"{self.__global_base_topic}/"
+        self.my_topic_prefix = f"{self.my_base_topic}/"
+        self.my_error_topic = f"{self.my_base_topic}/error"
         # self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.mqtt_client = aiomqtt.Client(
             mqtt_server,
@@ -93,6 +96,18 @@ class RxgMqttClient:
             f"{self.my_base_topic}/#"
         ]
 
+        # Handlers for agent subtopics, keyed by subtopic. Each takes the
+        # decoded payload and returns an MQTTResponse.
+        self.topic_handlers: dict[str, Callable[[Any], Coroutine[Any, Any, MQTTResponse]]] = {
+            "get_clients": lambda payload: self.exec_get_clients(self.mqtt_client),
+            "tcpdump_on_interface": lambda payload: self.handle_tcp_dump_on_interface(self.mqtt_client, payload),
+            "configure_radios": lambda payload: self.configure_radios(self.mqtt_client, payload),
+            "override_rxg/set": lambda payload: self.set_override_rxg(self.mqtt_client, payload),
+            "fallback_rxg/set": lambda payload: self.set_fallback_rxg(self.mqtt_client, payload),
+            "password/set": self.set_password,
+            "reboot": lambda payload: self.reboot(),
+        }
+
         # Holds scheduled jobs from `scheduler` so we can clean them up
         # on exit.
         self.scheduled_jobs: list[schedule.Job] = []
@@ -170,6 +185,7 @@ class RxgMqttClient:
             f"{self.my_base_topic}/status", "Disconnected", 1, True
         )
         self.mqtt_client._client.disconnect()
+        await self.wifi_control.aclose()
 
         # for job in self.scheduled_jobs:
         #     schedule.cancel_job(job)
@@ -184,7 +200,7 @@ class RxgMqttClient:
         if topic not in self.topics_of_interest:
             result, mid = await self.mqtt_client.subscribe(topic)
             self.topics_of_interest.append(topic)
-            self.logger.debug(f"Sub result: {str(result)}")
+            self.logger.debug("Sub result: %s", result)
             return result == mqtt.MQTT_ERR_SUCCESS
         else:
             return True
@@ -198,23 +214,22 @@ class RxgMqttClient:
         :return:
         """
         try:
-            if (msg.topic.matches(self.my_base_topic + "/error")
-                    or msg.topic.value.endswith('/_response')
-                    or msg.topic.value.endswith('/status') or not (
-                            msg.topic.matches(self.__global_base_topic + '/#') or msg.topic.matches(
-                        self.my_base_topic + '/#'))):
+            topic = msg.topic.value
+            is_global_topic = topic.startswith(self.global_topic_prefix)
+            if (topic == self.my_error_topic
+                    or topic.endswith(('/_response', '/status')) or not (
+                            is_global_topic or topic.startswith(self.my_topic_prefix))):
                 return
 
             self.logger.debug(
-                f"Received message on topic '{msg.topic}': {str(msg.payload)}"
+                "Received message on topic '%s': %s", msg.topic, msg.payload
             )
             # response_topic = f"{msg.topic}/_response"
-            is_global_topic = msg.topic.matches(self.__global_base_topic + '/#')
             bridge_ident = None
             if is_global_topic:
-                subtopic = msg.topic.value.removeprefix(self.__global_base_topic + '/')
+                subtopic = topic.removeprefix(self.global_topic_prefix)
             else:
-                subtopic = msg.topic.value.removeprefix(self.my_base_topic + '/')
+                subtopic = topic.removeprefix(self.my_topic_prefix)
             response_topic = f"{self.my_base_topic}/{subtopic}/_response"
             try:
                 if msg.payload is not None and msg.payload not in ["", b""]:
@@ -231,22 +246,11 @@ class RxgMqttClient:
                 else:
                     payload = None
                 self.logger.warning(f"Received message on topic '{msg.topic}': {str(msg.payload)}")
-                self.logger.debug(f"Payload: {payload}")
-
-                if subtopic == "get_clients":
-                    mqtt_response = await self.exec_get_clients(self.mqtt_client)
-                elif subtopic == "tcpdump_on_interface":
-                    mqtt_response = await self.handle_tcp_dump_on_interface(self.mqtt_client, payload)
-                elif subtopic == "configure_radios":
-                    mqtt_response = await self.configure_radios(self.mqtt_client, payload)
-                elif subtopic == "override_rxg/set":
-                    mqtt_response = await self.set_override_rxg(self.mqtt_client, payload)
-                elif subtopic == "fallback_rxg/set":
-                    mqtt_response = await self.set_fallback_rxg(self.mqtt_client, payload)
-                elif subtopic == "password/set":
-                    mqtt_response = await self.set_password(payload)
-                elif subtopic == "reboot":
-                    mqtt_response = await self.reboot()
+                self.logger.debug("Payload: %s", payload)
+
+                handler = self.topic_handlers.get(subtopic)
+                if handler is not None:
+                    mqtt_response = await handler(payload)
                 else:
                     mqtt_response = MQTTResponse(
                         status="validation_error",
@@ -275,7 +279,7 @@ class RxgMqttClient:
         except Exception as e:
             self.logger.error(f"Big nasty thing while handling message on topic '{msg.topic}'",exc_info=e)
             await self.mqtt_client.publish(
-                self.my_base_topic + "/error",
+                self.my_error_topic,
                 MQTTResponse(
                     status="agent_error",
                     errors=[[utils.get_full_class_name(e), str(e)]],
@@ -283,10 +287,14 @@ class RxgMqttClient:
             )
 
     async def exec_get_clients(self, client):
-        if self.kismet_control.is_kismet_running():
-            seen_clients = self.kismet_control.get_seen_devices()
-        else:
-            seen_clients = self.kismet_control.empty_seen_devices()
+        def get_seen_clients():
+            if self.kismet_control.is_kismet_running():
+                return self.kismet_control.get_seen_devices()
+            return self.kismet_control.empty_seen_devices()
+
+        # Both the process check and the kismet REST query block, so keep
+        # them off the event loop.
+        seen_clients = await asyncio.to_thread(get_seen_clients)
         return MQTTResponse(
             data=json.dumps(seen_clients),
         )
@@ -326,7 +334,7 @@ class RxgMqttClient:
         if self.kismet_control.is_kismet_running() and interface_name in self.kismet_control.active_kismet_interfaces().keys() and not interface_name.endswith("mon"):
             interface_name += "mon"
 
-        random_str = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
+        random_str = ''.join(random.choices(CAPTURE_NAME_CHARS, k=10))
         filepath = f"/tmp/{random_str}.pcap"
 
         cmd = ["tcpdump", "-i", interface_name, '-w', filepath]
@@ -371,7 +379,7 @@ class RxgMqttClient:
                 self.logger.debug(f"{interface_name} should be in monitor mode.")
                 if not self.kismet_control.is_kismet_running():
                     self.logger.debug(f"Starting kismet on {interface_name}mon")
-                    self.kismet_control.start_kismet(interface_name)
+                    await asyncio.to_thread(self.kismet_control.start_kismet, interface_name)
                 else:
                     if interface_name not in self.kismet_control.all_kismet_sources().keys():
                         self.logger.debug(f"Adding {interface_name}")
@@ -427,20 +435,25 @@ class RxgMqttClient:
         self.logger.info(f"Rebooting")
         utils.run_command("reboot", raise_on_fail=False)
 
-    async def set_override_rxg(self, client, payload):
+    def update_bootloader_config(self, key: str, value: Any) -> None:
+        """
+        Sets a single key in the bootloader config. Blocking: each load and
+        save mounts and unmounts the bootloader data partition.
+        """
         self.bootloader_config.load()
-        self.logger.info(f"Setting override_rxg: {payload}")
-        self.bootloader_config.data["boot_server_override"] = payload["value"]
+        self.bootloader_config.data[key] = value
         self.bootloader_config.save()
+
+    async def set_override_rxg(self, client, payload):
+        self.logger.info(f"Setting override_rxg: {payload}")
+        await asyncio.to_thread(self.update_bootloader_config, "boot_server_override", payload["value"])
         if self.agent_reconfig_callback is not None:
             await self.agent_reconfig_callback({"override_rxg": payload["value"]})
         return MQTTResponse(status="success", data=json.dumps(self.bootloader_config.data))
 
     async def set_fallback_rxg(self, client, payload):
-        self.bootloader_config.load()
         self.logger.info(f"Setting fallback_rxg: {payload}")
-        self.bootloader_config.data["boot_server_fallback"] = payload["value"]
-        self.bootloader_config.save()
+        await asyncio.to_thread(self.update_bootloader_config, "boot_server_fallback", payload["value"])
         if self.agent_reconfig_callback is not None:
             await self.agent_reconfig_callback({"fallback_rxg": payload["value"]})
         return MQTTResponse(status="success", data=json.dumps(self.bootloader_config.data))
@@ -3,10 +3,9 @@ import logging
 from ssl import VerifyMode
 from typing import Any, Callable, Literal, Optional
 
-from requests import JSONDecodeError
-
 from utils import get_current_unix_timestamp
 
+logger = logging.getLogger(__name__)
 
 
 class MQTTResponse:
@@ -28,7 +27,6 @@ class MQTTResponse:
         rest_reason: Optional[str] = None,
         bridge_ident: Optional[Any] = None,
     ):
-        self.logger = logging.getLogger(__name__)
         self.errors = errors
         if errors is None:
             self.errors: list = []
@@ -41,15 +39,15 @@ class MQTTResponse:
         self.is_hydrated_object = False
 
         # Try to parse data into json, but don't fret if we can't.
-        if type(data) in [str, bytes, bytearray]:
+        if isinstance(data, (str, bytes, bytearray)):
             try:
                 self.data = json.loads(data)
                 self.is_hydrated_object = True
-            except (JSONDecodeError, json.decoder.JSONDecodeError) as e:
-                self.logger.debug(
-                    f"Tried to decode data as JSON but it was not valid: {str(e)}"
+            except json.JSONDecodeError as e:
+                logger.debug(
+                    "Tried to decode data as JSON but it was not valid: %s", e
                 )
-                self.logger.debug(data)
+                logger.debug(data)
         else:
             # We're going to assume in this case it's some kind of
             # JSON-compatible structure.
@@ -58,12 +56,9 @@ class MQTTResponse:
     def to_json(self) -> str:
         res = json.dumps(
             {
-                i: self.__dict__[i]
-                for i in self.__dict__
-                if (
-                    (i not in ["logger", "_bridge_ident"])
-                    or (i == "_bridge_ident" and self.__dict__[i])
-                )
+                key: value
+                for key, value in self.__dict__.items()
+                if key != "_bridge_ident" or value
             },
             default=lambda o: o.__dict__,
             # sort_keys=True,
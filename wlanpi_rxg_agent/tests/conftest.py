@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The agent's modules import each other by top-level name (e.g. `from utils
+# import run_command`), as they do when run from the package directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+from unittest.mock import Mock
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("kismet_rest")
+
+from kismet_control import KismetControl  # noqa: E402
+
+
+def make_kismet_control(active: list[str]) -> KismetControl:
+    # Skip __init__, which reads the kismet config and connects to kismet.
+    kc = KismetControl.__new__(KismetControl)
+    kc.kismet_sources = Mock()
+    kc.kismet_sources.all.return_value = [
+        {
+            "kismet.datasource.interface": name,
+            "kismet.datasource.uuid": f"uuid-{name}",
+            "kismet.datasource.running": True,
+        }
+        for name in active
+    ]
+    kc.kismet_sources.interfaces.return_value = [
+        {
+            "kismet.datasource.probed.interface": name,
+            "kismet.datasource.probed.in_use_uuid": f"uuid-{name}",
+        }
+        for name in active
+    ]
+    kc.kismet_sources.close.return_value = True
+    kc.kismet_sources.add.return_value = True
+    return kc
+
+
+def test_set_sources_by_name_closes_unwanted_and_adds_missing():
+    kc = make_kismet_control(active=["wlan3", "wlan0", "wlan1"])
+
+    results = kc.set_sources_by_name(["wlan1", "wlan2"])
+
+    assert results == [
+        ("remove", "wlan3", True),
+        ("remove", "wlan0", True),
+        ("add", "wlan2", True),
+    ]
+    closed = [call.args[0] for call in kc.kismet_sources.close.call_args_list]
+    assert closed == ["uuid-wlan3", "uuid-wlan0"]
+    added = [call.kwargs["source"] for call in kc.kismet_sources.add.call_args_list]
+    assert added == ["wlan2"]
+    # Active sources are only queried once.
+    assert kc.kismet_sources.all.call_count == 1
+
+
+def test_set_sources_by_name_leaves_wanted_sources_open():
+    kc = make_kismet_control(active=["wlan0", "wlan1"])
+
+    assert kc.set_sources_by_name(["wlan0", "wlan1"]) == []
+    kc.kismet_sources.close.assert_not_called()
+    kc.kismet_sources.add.assert_not_called()
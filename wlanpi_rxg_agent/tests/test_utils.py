@@ -0,0 +1,50 @@
+import wlanpi_rxg_agent.utils as utils
+from wlanpi_rxg_agent.models.command_result import CommandResult
+
+
+def fake_ip_route(monkeypatch, output: str):
+    monkeypatch.setattr(
+        utils, "run_command", lambda *args, **kwargs: CommandResult(output, "", 0)
+    )
+
+
+def test_get_default_gateways_plain_route(monkeypatch):
+    fake_ip_route(
+        monkeypatch,
+        "default via 192.168.1.1 dev eth0\n"
+        "192.168.1.0/24 dev eth0 proto kernel scope link src 192.168.1.50\n",
+    )
+    assert utils.get_default_gateways() == {"eth0": "192.168.1.1"}
+
+
+def test_get_default_gateways_ignores_trailing_route_attributes(monkeypatch):
+    fake_ip_route(
+        monkeypatch,
+        "default via 10.0.0.1 dev eth0 proto dhcp src 10.0.0.23 metric 100\n"
+        "10.0.0.0/24 dev eth0 proto kernel scope link src 10.0.0.23 metric 100\n",
+    )
+    assert utils.get_default_gateways() == {"eth0": "10.0.0.1"}
+
+
+def test_get_default_gateways_multiple_interfaces(monkeypatch):
+    fake_ip_route(
+        monkeypatch,
+        "default via 10.0.0.1 dev eth0 proto dhcp src 10.0.0.23 metric 100\n"
+        "default via 172.16.4.1 dev wlan0 proto dhcp src 172.16.4.77 metric 600\n"
+        "default via 192.168.8.1 dev wlan1 metric 200\n"
+        "10.0.0.0/24 dev eth0 proto kernel scope link src 10.0.0.23 metric 100\n"
+        "172.16.4.0/22 dev wlan0 proto kernel scope link src 172.16.4.77\n",
+    )
+    assert utils.get_default_gateways() == {
+        "eth0": "10.0.0.1",
+        "wlan0": "172.16.4.1",
+        "wlan1": "192.168.8.1",
+    }
+
+
+def test_get_default_gateways_no_default_route(monkeypatch):
+    fake_ip_route(
+        monkeypatch,
+        "10.0.0.0/24 dev eth0 proto kernel scope link src 10.0.0.23\n",
+    )
+    assert utils.get_default_gateways() == {}
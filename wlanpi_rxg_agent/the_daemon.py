@@ -1,6 +1,8 @@
+import asyncio
+
 import daemon
 
 from wlanpi_rxg_agent import rxg_agent
 
 with daemon.DaemonContext():
-    rxg_agent.main()
+    asyncio.run(rxg_agent.main())
@@ -1,8 +1,10 @@
 import asyncio
-import datetime
+import functools
 import json
 import logging
+import re
 import shlex
+import socket
 import subprocess
 import time
 from asyncio.subprocess import Process
@@ -14,6 +16,10 @@ from wlanpi_rxg_agent.models.runcommand_error import RunCommandError, RunCommand
 
 logger = logging.getLogger('utils')
 
+DEFAULT_ROUTE_PATTERN = re.compile(
+    r"^default via (?P<gateway>\S+) dev (?P<interface>\S+)", re.MULTILINE
+)
+
 def run_command(
     cmd: Union[list, str],
     input: Optional[str] = None,
@@ -260,14 +266,13 @@ def get_full_class_name(obj: object) -> str:
 def get_default_gateways() -> dict[str, str]:
     # Execute 'ip route show' command which lists all network routes
     cmd = "ip route show"
-    output = run_command(cmd.split(" ")).stdout.split("\n")
+    output = run_command(cmd.split(" ")).stdout
 
-    gateways: dict[str, str] = {}
-    for line in output:
-        if "default via" in line:  # This is the default gateway line
-            res = line.split("via ")[1].split(" dev ")
-            gateways[res[1].strip()] = res[0].strip()
-    return gateways
+    # Pull the gateway and interface out of each default route line
+    return {
+        match.group("interface"): match.group("gateway")
+        for match in DEFAULT_ROUTE_PATTERN.finditer(output)
+    }
 
 
 def trace_route(target: str) -> dict[str, Any]:
@@ -276,12 +281,19 @@ def trace_route(target: str) -> dict[str, Any]:
     return output
 
 
+@functools.lru_cache(maxsize=None)
 def get_model_info() -> dict[str, str]:
+    """
+    Gets the device model info from wlanpi-model. The result is cached since
+    the hardware doesn't change while the agent is running; treat the
+    returned dict as read-only.
+    """
     model_info = run_command(["wlanpi-model"]).stdout.split("\n")
-    split_model_info = [a.split(":", 1) for a in model_info if (a.strip() != "" and ':' in a)]
     model_dict = {}
-    for a, b in split_model_info:
-        model_dict[a.strip()] = b.strip()
+    for line in model_info:
+        key, sep, value = line.partition(":")
+        if sep:
+            model_dict[key.strip()] = value.strip()
     return model_dict
 
 
@@ -291,7 +303,8 @@ def get_uptime() -> dict[str, str]:
 
 
 def get_hostname() -> str:
-    return run_command(["hostname"]).stdout.strip("\n ")
+    # Same value `hostname` prints, without forking a process for it.
+    return socket.gethostname()
 
 
 def get_interface_ip_addrs(interface: Optional[str] = None) -> dict[str, Any]:
@@ -310,11 +323,17 @@ def get_interface_ip_addr(interface: str, version: int = 4) -> str:
 
 
 def get_current_unix_timestamp():
-    ms = datetime.datetime.now()
-    return time.mktime(ms.timetuple()) * 1000
+    # Whole seconds, in milliseconds, as before; time.time() is already epoch
+    # based, so there's no need to round-trip through a local datetime.
+    return (time.time() // 1) * 1000
 
 
+@functools.lru_cache(maxsize=None)
 def get_eth0_mac() -> str:
+    """
+    Gets the MAC address of eth0. The result is cached since the hardware
+    address doesn't change while the agent is running.
+    """
     eth0_res = subprocess.run(
         "jc ifconfig eth0", capture_output=True, text=True, shell=True
     )